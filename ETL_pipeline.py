@@ -7,6 +7,7 @@ from openpyxl import load_workbook
 
 from cleaning_utils import clean_large_file_in_chunks
 from json_parser import parse_json
+from price_index import update_price_index
 from tall_format_csv_extractor import extract_tall_format_csv
 from wide_format_csv_extractor import extract_wide_format_csv
 
@@ -53,6 +54,7 @@ def main():
     parser.add_argument("--campus_id", required=True, help="Hospital campus ID")
     parser.add_argument("--user", required=True, help="Name of the user running this pipeline")
     parser.add_argument("--format", required=False, choices=["json", "tall csv", "wide csv"], help="Optional format override. If not provided, pulled from hospital registry")
+    parser.add_argument("--memory_budget", "--memory-budget", required=False, help="Optional memory budget for cleaning (e.g. 2GB). Chunk size is adapted to fit it")
     args = parser.parse_args()
 
     # Load hospital metadata
@@ -84,6 +86,19 @@ def main():
         input_path=extracted_path,
         healthcare_system=healthcare_system,
         campus_id=args.campus_id,
+        base_dir=".",
+        memory_budget=args.memory_budget
+    )
+
+    # Phase 3: Indexing
+    print("\nUpdating cross-hospital price index...")
+    logging.info("Price index phase started.")
+
+    cleaned_path = os.path.join("data", "cleaned data", healthcare_system, f"{args.campus_id}_cleaned.csv")
+    update_price_index(
+        cleaned_path=cleaned_path,
+        healthcare_system=healthcare_system,
+        campus_id=args.campus_id,
         base_dir="."
     )
 
@@ -1,9 +1,16 @@
 import pandas as pd
 import os
 import re
+import sys
 import json
 import logging
 import argparse
+from compression_utils import open_raw_file
+
+try:
+    import resource
+except ImportError:
+    resource = None
 
 # Constants
 PRICE_FIELDS = [
@@ -18,6 +25,13 @@ TEXT_FIELDS = [
 
 PLACEHOLDER_VALUE = "999999999"
 
+# Adaptive chunk sizing: peak usage while cleaning is a multiple of the chunk's
+# own footprint (string ops, rule copies, CSV writer buffers)
+MEMORY_SAFETY_FACTOR = 4
+SIZING_SAMPLE_ROWS = 5000
+MIN_CHUNKSIZE = 1000
+MAX_CHUNKSIZE = 1000000
+
 def apply_conditional_rules(df):
     violations = {}
     mask1 = df[PRICE_FIELDS[:3]].notna().any(axis=1) & (~df[["insurance payer name", "insurance plan name", "negotiated methodology"]].notna().all(axis=1))
@@ -137,7 +151,109 @@ def validate_code_length(df):
         df = df[valid | df["code"].isna()]
     return df
 
-def clean_large_file_in_chunks(input_path, healthcare_system, campus_id, base_dir=".", chunksize=100000):
+def prepare_chunk(chunk):
+    chunk.columns = chunk.columns.str.lower().str.strip()
+
+    if "modifiers" not in chunk.columns:
+        chunk["modifiers"] = pd.NA
+
+    chunk = clean_price_fields(chunk)
+    chunk = remove_invalid_tokens(chunk)
+    chunk = normalize_text_fields(chunk)
+    chunk = normalize_modifiers(chunk)
+    chunk = validate_negotiated_algorithm_format(chunk)
+    chunk = validate_code_length(chunk)
+    return chunk
+
+def parse_memory_budget(value):
+    units = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*", str(value).upper())
+    if not match:
+        raise ValueError(f"Invalid memory budget '{value}', expected e.g. '2GB' or '512MB'.")
+    number, unit = match.groups()
+    if unit in ("K", "M", "G"):
+        unit += "B"
+    return int(float(number) * units[unit])
+
+def get_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return None
+        # Non-Linux fallback: peak RSS, reported in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def estimate_chunksize(input_path, memory_budget):
+    with open_raw_file(input_path) as source:
+        sample = pd.read_csv(source, dtype=str, nrows=SIZING_SAMPLE_ROWS, low_memory=False)
+    if sample.empty:
+        return MIN_CHUNKSIZE
+
+    cleaned = prepare_chunk(sample.copy())
+    bytes_per_row = max(
+        sample.memory_usage(deep=True).sum() / len(sample),
+        cleaned.memory_usage(deep=True).sum() / max(len(cleaned), 1)
+    )
+    available = max(memory_budget - (get_rss_bytes() or 0), memory_budget // 4)
+    chunksize = int(available / (bytes_per_row * MEMORY_SAFETY_FACTOR))
+    chunksize = min(max(chunksize, MIN_CHUNKSIZE), MAX_CHUNKSIZE)
+    logging.info(f"Estimated {bytes_per_row:,.0f} bytes/row over {len(sample.columns)} columns, starting chunksize {chunksize:,}")
+    return chunksize
+
+def adjust_chunksize(chunksize, memory_budget):
+    rss = get_rss_bytes()
+    if rss is None:
+        return chunksize
+    if rss > memory_budget * 0.9:
+        new_size = int(chunksize * memory_budget * 0.75 / rss)
+    elif rss < memory_budget * 0.5:
+        new_size = int(chunksize * 1.5)
+    else:
+        return chunksize
+    new_size = min(max(new_size, MIN_CHUNKSIZE), MAX_CHUNKSIZE)
+    if new_size != chunksize:
+        logging.info(f"RSS {rss / (1024 * 1024):,.0f} MB of {memory_budget / (1024 * 1024):,.0f} MB budget, chunksize {chunksize:,} -> {new_size:,}")
+    return new_size
+
+def get_input_fingerprint(input_path):
+    stat = os.stat(input_path)
+    return {"input_path": os.path.abspath(input_path), "input_size": stat.st_size, "input_mtime": stat.st_mtime}
+
+def load_checkpoint(checkpoint_path, input_path):
+    if not os.path.exists(checkpoint_path):
+        return None
+    try:
+        with open(checkpoint_path, "r") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable checkpoint {checkpoint_path}: {e}")
+        return None
+    if checkpoint.get("input") != get_input_fingerprint(input_path):
+        logging.warning(f"Input changed since checkpoint {checkpoint_path} was written, starting from scratch")
+        return None
+    return checkpoint
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    # Write-then-rename so a crash mid-write never leaves a torn checkpoint
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+def needs_header(path):
+    return not os.path.exists(path) or os.path.getsize(path) == 0
+
+def truncate_file(path, length):
+    if os.path.exists(path):
+        with open(path, "r+b") as f:
+            f.truncate(length)
+    elif length:
+        raise FileNotFoundError(f"Checkpointed output missing: {path}")
+
+def clean_large_file_in_chunks(input_path, healthcare_system, campus_id, base_dir=".", chunksize=100000, resume=True, checkpoint_every=1, memory_budget=None):
     output_dir = os.path.join(base_dir, "data", "cleaned data", healthcare_system)
     os.makedirs(output_dir, exist_ok=True)
     output_path = os.path.join(output_dir, f"{campus_id}_cleaned.csv")
@@ -151,65 +267,110 @@ def clean_large_file_in_chunks(input_path, healthcare_system, campus_id, base_di
     os.makedirs(rule_violation_dir, exist_ok=True)
     rule_csv_path = os.path.join(rule_violation_dir, f"{campus_id}_rules_violated.csv")
 
-    if os.path.exists(output_path):
-        os.remove(output_path)
-
-    total_rows = 0
-    total_violation_counts = {f"rule_{i}": 0 for i in range(1, 11)}
-    total_algorithm_format_issues = 0
-    total_duplicates_dropped = 0
-    all_violated_rows = []
-
-    for chunk_number, chunk in enumerate(pd.read_csv(input_path, dtype=str, chunksize=chunksize, low_memory=False), start=1):
-        chunk.columns = chunk.columns.str.lower().str.strip()
-
-        if "modifiers" not in chunk.columns:
-            chunk["modifiers"] = pd.NA
-
-        chunk = clean_price_fields(chunk)
-        chunk = remove_invalid_tokens(chunk)
-        chunk = normalize_text_fields(chunk)
-        chunk = normalize_modifiers(chunk)
-        chunk = validate_negotiated_algorithm_format(chunk)
-        chunk = validate_code_length(chunk)
-
-        before_dedup = len(chunk)
-        chunk = drop_duplicates(chunk)
-        after_dedup = len(chunk)
-        total_duplicates_dropped += (before_dedup - after_dedup)
-
-        violations = apply_conditional_rules(chunk)
-
-        rule_tags = pd.Series([[] for _ in range(len(chunk))], index=chunk.index)
-        for rule, mask in violations.items():
-            total_violation_counts[rule] += int(mask.sum())
-            rule_tags[mask] = rule_tags[mask].apply(lambda lst: lst + [rule])
-
-        if rule_tags.notna().any():
-            rule_df = chunk.copy()
-            rule_df["rules_violated"] = rule_tags.apply(lambda lst: ",".join(lst) if lst else pd.NA)
-            rule_df = rule_df[rule_df["rules_violated"].notna()]
-            all_violated_rows.append(rule_df)
-            # Drop those rows from the chunk
-            violating_indices = rule_df.index
-            chunk = chunk.drop(index=violating_indices)
-
-
-        total_algorithm_format_issues += int(chunk["negotiated_algorithm_invalid"].sum())
-        total_rows += len(chunk)
-
-        if "transparency_score" in chunk.columns:
-            chunk.drop(columns=["transparency_score"], inplace=True)
-        if "negotiated_algorithm_invalid" in chunk.columns:
-            chunk.drop(columns=["negotiated_algorithm_invalid"], inplace=True)
-
-        chunk.to_csv(output_path, mode='a', index=False, header=not os.path.exists(output_path))
-
-        logging.info(f"[{chunk_number}] Processed {len(chunk):,} rows")
-
-    if all_violated_rows:
-        violated_df = pd.concat(all_violated_rows)
-        violated_df.to_csv(rule_csv_path, index=False)
+    checkpoint_dir = os.path.join(logs_dir, "checkpoints", healthcare_system)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    checkpoint_path = os.path.join(checkpoint_dir, f"{campus_id}_checkpoint.json")
+
+    checkpoint = load_checkpoint(checkpoint_path, input_path) if resume else None
+
+    if checkpoint:
+        # Drop anything written after the last committed chunk
+        truncate_file(output_path, checkpoint["output_bytes"])
+        truncate_file(rule_csv_path, checkpoint["rule_csv_bytes"])
+        counters = checkpoint["counters"]
+        total_rows = counters["total_rows"]
+        total_violation_counts = counters["total_violation_counts"]
+        total_algorithm_format_issues = counters["total_algorithm_format_issues"]
+        total_duplicates_dropped = counters["total_duplicates_dropped"]
+        input_rows_consumed = checkpoint["input_rows_consumed"]
+        start_chunk = checkpoint["chunk_number"] + 1
+        logging.info(f"Resuming {campus_id} from chunk {start_chunk} ({input_rows_consumed:,} input rows already cleaned)")
+    else:
+        for path in (output_path, rule_csv_path, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+        total_rows = 0
+        total_violation_counts = {f"rule_{i}": 0 for i in range(1, 11)}
+        total_algorithm_format_issues = 0
+        total_duplicates_dropped = 0
+        input_rows_consumed = 0
+        start_chunk = 1
+
+    if memory_budget:
+        memory_budget = parse_memory_budget(memory_budget)
+        chunksize = estimate_chunksize(input_path, memory_budget)
+
+    with open_raw_file(input_path) as source:
+        chunks = pd.read_csv(source, dtype=str, chunksize=chunksize, low_memory=False)
+
+        # Re-read past committed rows through the parser so quoted newlines stay aligned
+        skipped = 0
+        while skipped < input_rows_consumed:
+            skipped += len(chunks.get_chunk(min(chunksize, input_rows_consumed - skipped)))
+
+        chunk_number = start_chunk - 1
+        while True:
+            try:
+                chunk = chunks.get_chunk(chunksize)
+            except StopIteration:
+                break
+            chunk_number += 1
+            input_rows_consumed += len(chunk)
+            chunk = prepare_chunk(chunk)
+
+            before_dedup = len(chunk)
+            chunk = drop_duplicates(chunk)
+            after_dedup = len(chunk)
+            total_duplicates_dropped += (before_dedup - after_dedup)
+
+            violations = apply_conditional_rules(chunk)
+
+            rule_tags = pd.Series([[] for _ in range(len(chunk))], index=chunk.index)
+            for rule, mask in violations.items():
+                total_violation_counts[rule] += int(mask.sum())
+                rule_tags[mask] = rule_tags[mask].apply(lambda lst: lst + [rule])
+
+            if rule_tags.notna().any():
+                rule_df = chunk.copy()
+                rule_df["rules_violated"] = rule_tags.apply(lambda lst: ",".join(lst) if lst else pd.NA)
+                rule_df = rule_df[rule_df["rules_violated"].notna()]
+                if not rule_df.empty:
+                    rule_df.to_csv(rule_csv_path, mode='a', index=False, header=needs_header(rule_csv_path))
+                # Drop those rows from the chunk
+                violating_indices = rule_df.index
+                chunk = chunk.drop(index=violating_indices)
+
+
+            total_algorithm_format_issues += int(chunk["negotiated_algorithm_invalid"].sum())
+            total_rows += len(chunk)
+
+            if "transparency_score" in chunk.columns:
+                chunk.drop(columns=["transparency_score"], inplace=True)
+            if "negotiated_algorithm_invalid" in chunk.columns:
+                chunk.drop(columns=["negotiated_algorithm_invalid"], inplace=True)
+
+            chunk.to_csv(output_path, mode='a', index=False, header=needs_header(output_path))
+
+            logging.info(f"[{chunk_number}] Processed {len(chunk):,} rows")
+
+            if chunk_number % checkpoint_every == 0:
+                save_checkpoint(checkpoint_path, {
+                    "input": get_input_fingerprint(input_path),
+                    "chunk_number": chunk_number,
+                    "input_rows_consumed": input_rows_consumed,
+                    "output_bytes": os.path.getsize(output_path),
+                    "rule_csv_bytes": os.path.getsize(rule_csv_path) if os.path.exists(rule_csv_path) else 0,
+                    "counters": {
+                        "total_rows": total_rows,
+                        "total_violation_counts": total_violation_counts,
+                        "total_algorithm_format_issues": total_algorithm_format_issues,
+                        "total_duplicates_dropped": total_duplicates_dropped
+                    }
+                })
+
+            del chunk
+            if memory_budget:
+                chunksize = adjust_chunksize(chunksize, memory_budget)
 
     total_dropped_rows = sum(total_violation_counts.values())
     total_records_examined = total_rows + total_dropped_rows
@@ -241,6 +402,9 @@ def clean_large_file_in_chunks(input_path, healthcare_system, campus_id, base_di
 
     logging.info(f"Updated dev log saved to: {dev_log_path}")
 
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
     logging.info(f"\nCleaned CSV saved to:\n  {output_path} ({os.path.getsize(output_path) / (1024 * 1024):.2f} MB)")
     if os.path.exists(rule_csv_path):
         logging.info(f"Rules violations saved to:\n  {rule_csv_path}")
@@ -252,6 +416,8 @@ if __name__ == "__main__":
     parser.add_argument("--campus_id", required=True, help="Campus ID")
     parser.add_argument("--registry", default="Hospital Registry.xlsx", help="Path to hospital registry")
     parser.add_argument("--base_dir", default=".", help="Base directory")
+    parser.add_argument("--memory_budget", "--memory-budget", help="Size chunks to fit this memory budget (e.g. 2GB, 512MB) instead of a fixed chunksize")
+    parser.add_argument("--no_resume", action="store_true", help="Ignore any checkpoint and clean from the first chunk")
     args = parser.parse_args()
 
     metadata = load_registry_info(args.campus_id, args.registry)
@@ -267,5 +433,7 @@ if __name__ == "__main__":
         input_path=input_path,
         healthcare_system=healthcare_system,
         campus_id=args.campus_id,
-        base_dir=args.base_dir
+        base_dir=args.base_dir,
+        resume=not args.no_resume,
+        memory_budget=args.memory_budget
     )
@@ -0,0 +1,69 @@
+import io
+import gzip
+import zipfile
+import logging
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Leading bytes used to detect the container, independent of the file extension
+GZIP_MAGIC = b"\x1f\x8b"
+ZIP_MAGIC = b"PK\x03\x04"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+def detect_compression(path):
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(ZIP_MAGIC):
+        return "zip"
+    if head.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+def _pick_zip_member(zf, path):
+    members = [m for m in zf.infolist() if not m.is_dir() and not m.filename.startswith("__MACOSX/")]
+    if not members:
+        raise ValueError(f"Zip archive '{path}' contains no files.")
+    member = max(members, key=lambda m: m.file_size)
+    if len(members) > 1:
+        logging.warning(f"Zip archive '{path}' has {len(members)} files, reading the largest: {member.filename}")
+    return member
+
+@contextmanager
+def open_raw_file(path, mode='rt', encoding='utf-8-sig'):
+    """Open a plain, gzip, zip or zstd file, decompressing as a stream."""
+    if mode not in ('rt', 'rb'):
+        raise ValueError(f"Unsupported mode '{mode}', expected 'rt' or 'rb'.")
+
+    compression = detect_compression(path)
+    with open(path, 'rb') as raw:
+        if compression == "gzip":
+            stream = gzip.GzipFile(fileobj=raw, mode='rb')
+        elif compression == "zip":
+            zf = zipfile.ZipFile(raw)
+            stream = zf.open(_pick_zip_member(zf, path))
+        elif compression == "zstd":
+            if zstandard is None:
+                raise ImportError(f"'{path}' is zstd-compressed; install the 'zstandard' package to read it.")
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        else:
+            stream = raw
+
+        if compression:
+            logging.info(f"Streaming {compression} decompression for: {path}")
+
+        if mode == 'rt':
+            stream = io.TextIOWrapper(io.BufferedReader(stream) if compression == "zstd" else stream, encoding=encoding)
+
+        try:
+            yield stream
+        finally:
+            if stream is not raw:
+                stream.close()
+            if compression == "zip":
+                zf.close()
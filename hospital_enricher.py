@@ -1,10 +1,12 @@
 # hospital_enricher_v3.py
 import os
 import re
+import json
 import time
 import requests
 import pandas as pd
-from bs4 import BeautifulSoup
+import lxml.html
+import lxml.etree
 from urllib.parse import urljoin
 from dotenv import load_dotenv
 import yaml
@@ -32,6 +34,9 @@ LEAPFROG_API_KEY = os.getenv("LEAPFROG_API_KEY")
 LEAPFROG_CONFIG = config['leapfrog']
 BASE_API_URL = LEAPFROG_CONFIG['base_api_url']
 BASE_HOSPITAL_URL = LEAPFROG_CONFIG['base_hospital_url']
+SEARCH_RADIUS = LEAPFROG_CONFIG.get('search_radius', 40)
+CACHE_DIR = LEAPFROG_CONFIG.get('cache_dir', "data/leapfrog cache")
+CACHE_TTL_SECONDS = LEAPFROG_CONFIG.get('cache_ttl_days', 30) * 86400
 
 # Words to remove from campus_id
 GENERIC_WORDS = ["hospital", "medical", "center", "campus", "health", "system", "of", "corporation", "general", "university", "s", "regional","INC"]
@@ -68,29 +73,79 @@ def fetch_cms_data(limit=50000):
 def normalize(text):
     return re.sub(r"[^\w]", "", str(text).lower().strip())
 
-def scrape_hospitals_for_city(city, state):
-    logger.info(f"Scraping hospitals for {city}, {state}")
+def has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Compiled once; equivalent to the .itemWrapper / .name a / .address / .grade img / .date selectors
+ITEM_XPATH = lxml.etree.XPath(f"//*[{has_class('itemWrapper')}]")
+NAME_LINK_XPATH = lxml.etree.XPath(f".//*[{has_class('name')}]//a")
+ADDRESS_XPATH = lxml.etree.XPath(f".//*[{has_class('address')}]")
+GRADE_IMG_XPATH = lxml.etree.XPath(f".//*[{has_class('grade')}]//img")
+DATE_XPATH = lxml.etree.XPath(f".//*[{has_class('date')}]")
+
+def get_cache_path(city, state, radius):
+    return os.path.join(CACHE_DIR, f"{normalize(city)}_{normalize(state)}_{radius}.json")
+
+def load_cached_response(cache_path):
+    if not os.path.exists(cache_path):
+        return None
+    age = time.time() - os.path.getmtime(cache_path)
+    if age > CACHE_TTL_SECONDS:
+        return None
+    with open(cache_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def fetch_leapfrog_results(city, state, radius=SEARCH_RADIUS):
+    cache_path = get_cache_path(city, state, radius)
+    cached = load_cached_response(cache_path)
+    if cached is not None:
+        logger.info(f"Using cached Leapfrog results for {city}, {state} ({cache_path})")
+        return cached
+
     params = {
         "apiKey": LEAPFROG_API_KEY,
         "f.cityState": f"{city},{state}",
-        "f.radius": 40
+        "f.radius": radius
     }
     headers = {"Accept": "application/json"}
     response = requests.get(BASE_API_URL, headers=headers, params=params)
+    time.sleep(SLEEP_SECONDS)
+
+    if response.status_code != 200:
+        logger.error(f"Failed to fetch hospitals for {city}, {state}. Status code: {response.status_code}")
+        return None
+
+    data = response.json()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    return data
+
+def element_text(element, sep=None):
+    # sep mirrors BeautifulSoup's get_text(sep, strip=True); without it, raw text_content()
+    if sep is None:
+        return element.text_content()
+    return sep.join(t.strip() for t in element.itertext() if t.strip())
+
+def scrape_hospitals_for_city(city, state):
+    logger.info(f"Scraping hospitals for {city}, {state}")
+    data = fetch_leapfrog_results(city, state)
     hospitals = []
 
-    if response.status_code == 200:
-        data = response.json()
+    if data:
         html_content = data['response']['html']
-        soup = BeautifulSoup(html_content, 'lxml')
-        for item in soup.select(".itemWrapper"):
-            name = clean_text(item.select_one(".name a").get_text())
-            slug = item.select_one(".name a")['href']
+        if not html_content or not html_content.strip():
+            return hospitals
+        tree = lxml.html.fromstring(html_content)
+        for item in ITEM_XPATH(tree):
+            name_link = NAME_LINK_XPATH(item)[0]
+            name = clean_text(element_text(name_link))
+            slug = name_link.get('href')
             leapfrog_url = urljoin(BASE_HOSPITAL_URL, slug)
-            address = clean_text(item.select_one(".address").get_text(" ", strip=True))
-            grade_img = item.select_one(".grade img")
-            leapfrog_grade = grade_img['alt'].replace("Grade ", "") if grade_img else "N/A"
-            leapfrog_grade_term = clean_text(item.select_one(".date").get_text())
+            address = clean_text(element_text(ADDRESS_XPATH(item)[0], " "))
+            grade_img = GRADE_IMG_XPATH(item)
+            leapfrog_grade = grade_img[0].get('alt', "").replace("Grade ", "") if grade_img else "N/A"
+            leapfrog_grade_term = clean_text(element_text(DATE_XPATH(item)[0]))
 
             zip_code = extract_zip_code(address)
             campus_id = generate_campus_id(name)
@@ -110,7 +165,6 @@ def scrape_hospitals_for_city(city, state):
                 "leapfrog_grade_term": leapfrog_grade_term,
                 "leapfrog_grade_url": leapfrog_url
             })
-            time.sleep(SLEEP_SECONDS)
 
     return hospitals
 
@@ -188,5 +242,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-else:
-    logger.error(f"Failed to fetch hospitals for {city}, {state}. Status code: {response.status_code}")
@@ -2,10 +2,11 @@ import ijson
 import argparse
 import os
 import pandas as pd
+from compression_utils import open_raw_file
 
 def extract_keys_ijson(input_file):
     result = ""
-    with open(input_file, 'r', encoding='utf-8-sig') as f:
+    with open_raw_file(input_file) as f:
         parser = ijson.parse(f)
         seen = set()
         for prefix, event, value in parser:
@@ -3,6 +3,7 @@ import json
 import argparse
 import logging
 import pandas as pd
+from compression_utils import open_raw_file
 
 def load_registry_info(campus_id, registry_path):
     df = pd.read_excel(registry_path, sheet_name="Sheet1")
@@ -17,7 +18,7 @@ def load_registry_info(campus_id, registry_path):
 
 def create_sample(input_file, output_file):
     try:
-        with open(input_file, 'r', encoding='utf-8-sig') as infile:
+        with open_raw_file(input_file) as infile:
             data = json.load(infile)
 
         sample = {
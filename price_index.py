@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import logging
+import argparse
+import pandas as pd
+
+INDEX_COLUMNS = ["code type", "code", "insurance payer name", "negotiated price"]
+
+# WITHOUT ROWID clusters rows on the primary key, so every code's rows sit
+# together on disk, ordered by code type then code.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_index (
+    code_type TEXT NOT NULL,
+    code TEXT NOT NULL,
+    payer TEXT NOT NULL,
+    healthcare_system TEXT NOT NULL,
+    campus_id TEXT NOT NULL,
+    min_price REAL,
+    median_price REAL,
+    max_price REAL,
+    n_prices INTEGER,
+    PRIMARY KEY (code_type, code, payer, campus_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_price_index_code ON price_index (code);
+CREATE INDEX IF NOT EXISTS idx_price_index_campus ON price_index (campus_id);
+"""
+
+def get_index_path(base_dir="."):
+    return os.path.join(base_dir, "data", "price index", "price_index.sqlite")
+
+def connect_index(index_path):
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    conn = sqlite3.connect(index_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+def aggregate_campus_prices(cleaned_path, chunksize=500000):
+    parts = []
+    for chunk in pd.read_csv(cleaned_path, dtype=str, usecols=lambda c: c.lower().strip() in INDEX_COLUMNS, chunksize=chunksize):
+        chunk.columns = chunk.columns.str.lower().str.strip()
+        chunk["negotiated price"] = pd.to_numeric(chunk["negotiated price"], errors='coerce')
+        chunk = chunk.dropna(subset=["code", "code type", "negotiated price"])
+        chunk = chunk[~chunk["code"].isin(["", "nan"]) & ~chunk["code type"].isin(["", "NAN"])]
+        chunk["insurance payer name"] = chunk["insurance payer name"].fillna("")
+        parts.append(chunk)
+
+    if not parts:
+        return pd.DataFrame(columns=["code_type", "code", "payer", "min_price", "median_price", "max_price", "n_prices"])
+
+    prices = pd.concat(parts, ignore_index=True)
+    agg = (
+        prices.groupby(["code type", "code", "insurance payer name"])["negotiated price"]
+        .agg(min_price="min", median_price="median", max_price="max", n_prices="count")
+        .reset_index()
+        .rename(columns={"code type": "code_type", "insurance payer name": "payer"})
+    )
+    return agg
+
+def update_price_index(cleaned_path, healthcare_system, campus_id, base_dir="."):
+    index_path = get_index_path(base_dir)
+    agg = aggregate_campus_prices(cleaned_path)
+    agg["healthcare_system"] = healthcare_system
+    agg["campus_id"] = campus_id
+
+    rows = agg[["code_type", "code", "payer", "healthcare_system", "campus_id",
+                "min_price", "median_price", "max_price", "n_prices"]].itertuples(index=False, name=None)
+
+    conn = connect_index(index_path)
+    try:
+        with conn:
+            # Replace this campus's slice only; other campuses stay untouched
+            conn.execute("DELETE FROM price_index WHERE campus_id = ?", (campus_id,))
+            conn.executemany("INSERT INTO price_index VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    finally:
+        conn.close()
+
+    logging.info(f"Price index updated for {campus_id}: {len(agg):,} code/payer aggregates -> {index_path}")
+    return len(agg)
+
+def lookup_code(code, code_type=None, payer=None, base_dir="."):
+    query = "SELECT * FROM price_index WHERE code = ?"
+    params = [str(code).strip()]
+    if code_type:
+        query = "SELECT * FROM price_index WHERE code_type = ? AND code = ?"
+        params.insert(0, str(code_type).strip().upper())
+    if payer:
+        query += " AND payer = ?"
+        params.append(str(payer).strip().lower())
+
+    conn = connect_index(get_index_path(base_dir))
+    try:
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clearcare cross-hospital price index")
+    parser.add_argument("--campus_id", help="Index the cleaned file of this campus")
+    parser.add_argument("--healthcare_system", help="Healthcare system of the campus being indexed")
+    parser.add_argument("--code", help="Look up negotiated prices for this code across all campuses")
+    parser.add_argument("--code_type", help="Optional code type filter for --code (e.g. CPT, DRG)")
+    parser.add_argument("--payer", help="Optional payer filter for --code")
+    parser.add_argument("--base_dir", default=".", help="Base directory")
+    args = parser.parse_args()
+
+    if args.campus_id:
+        if not args.healthcare_system:
+            parser.error("--healthcare_system is required with --campus_id")
+        healthcare_system = args.healthcare_system.lower().replace(" ", "_")
+        cleaned_path = os.path.join(args.base_dir, "data", "cleaned data", healthcare_system, f"{args.campus_id}_cleaned.csv")
+        count = update_price_index(cleaned_path, healthcare_system, args.campus_id, base_dir=args.base_dir)
+        print(f"Indexed {count:,} code/payer aggregates for {args.campus_id}")
+
+    if args.code:
+        print(lookup_code(args.code, code_type=args.code_type, payer=args.payer, base_dir=args.base_dir).to_string(index=False))